@@ -1,4 +1,5 @@
 """Defines the reinforcement learning `OnPolicyRLEngine`."""
+import inspect
 import itertools
 import os
 import queue
@@ -17,6 +18,7 @@ from typing import (
     cast,
     Iterator,
     Callable,
+    Tuple,
 )
 
 import torch
@@ -31,13 +33,14 @@ from torch.optim.lr_scheduler import _LRScheduler
 
 from core.algorithms.onpolicy_sync.losses.abstract_loss import AbstractActorCriticLoss
 from core.algorithms.onpolicy_sync.policy import ActorCriticModel
+from core.algorithms.onpolicy_sync.rollout_graph import RolloutCUDAGraph
 from core.algorithms.onpolicy_sync.storage import RolloutStorage
 from core.algorithms.onpolicy_sync.vector_sampled_tasks import (
     VectorSampledTasks,
     COMPLETE_TASK_METRICS_KEY,
 )
 from core.base_abstractions.experiment_config import ExperimentConfig, MachineParams
-from core.base_abstractions.misc import RLStepResult
+from core.base_abstractions.misc import RLStepResult, ActorCriticOutput, Memory
 from utils.experiment_utils import (
     set_deterministic_cudnn,
     set_seed,
@@ -147,6 +150,7 @@ class OnPolicyRLEngine(object):
 
         self.observation_set = None
         self.actor_critic: Optional[ActorCriticModel] = None
+        self.rollout_cuda_graph: Optional[RolloutCUDAGraph] = None
         if self.num_samplers > 0:
             if self.machine_params.observation_set is not None:
                 # centralized observation set,
@@ -216,6 +220,7 @@ class OnPolicyRLEngine(object):
                 else None,
                 mp_ctx=self.mp_ctx,
                 max_processes=self.max_sampler_processes_per_worker,
+                shared_memory_observations=self.machine_params.shared_memory_observations,
             )
         return self._vector_tasks
 
@@ -368,11 +373,21 @@ class OnPolicyRLEngine(object):
             visualizer.collect(vector_task=self.vector_tasks, alive=keep)
         return npaused
 
+    @property
+    def rollout_actor_critic(
+        self,
+    ) -> Callable[..., Tuple[ActorCriticOutput, Optional[Memory]]]:
+        """The callable used for the forward passes when collecting
+        rollouts."""
+        if self.rollout_cuda_graph is not None:
+            return self.rollout_cuda_graph
+        return cast(ActorCriticModel, self.actor_critic)
+
     def act(self, rollouts: RolloutStorage):
         with torch.no_grad():
             step_observation = rollouts.pick_observation_step(rollouts.step)
             memory = rollouts.pick_memory_step(rollouts.step)
-            actor_critic_output, memory = self.actor_critic(
+            actor_critic_output, memory = self.rollout_actor_critic(
                 step_observation,
                 memory,
                 rollouts.prev_actions[rollouts.step : rollouts.step + 1],
@@ -395,9 +410,13 @@ class OnPolicyRLEngine(object):
         actions, actor_critic_output, memory, _ = self.act(rollouts=rollouts)
 
         # Squeeze step and action dimensions and send a list for each sampler's agents
-        outputs: List[RLStepResult] = self.vector_tasks.step(
-            [[a.item() for a in ac] for ac in actions.squeeze(0).squeeze(-1)]
-        )
+        # (copied to the host at once, rather than one action at a time)
+        self.vector_tasks.async_step(actions.squeeze(0).squeeze(-1).tolist())
+
+        # Computed on the device while the samplers are stepping their tasks
+        action_log_probs = actor_critic_output.distributions.log_probs(actions)
+
+        outputs: List[RLStepResult] = self.vector_tasks.wait_step()
 
         # Save after task completion metrics
         for step_result in outputs:
@@ -447,9 +466,7 @@ class OnPolicyRLEngine(object):
             else batch,
             memory=self._active_memory(memory, keep),
             actions=actions[:, keep],
-            action_log_probs=actor_critic_output.distributions.log_probs(actions)[
-                :, keep
-            ],
+            action_log_probs=action_log_probs[:, keep],
             value_preds=actor_critic_output.values[:, keep],
             rewards=rewards[:, keep],
             masks=masks[:, keep],
@@ -558,6 +575,45 @@ class OnPolicyTrainer(OnPolicyRLEngine):
             params=[p for p in self.actor_critic.parameters() if p.requires_grad]
         )
 
+        # Mixed precision is only used when training on a CUDA device, bfloat16 (which
+        # requires no loss scaling) is preferred to float16 on devices with native
+        # bfloat16 support (compute capability >= 8.0, bfloat16 is only emulated on
+        # older devices), float16 with loss scaling is used otherwise.
+        self.use_amp = self.training_pipeline.use_amp and self.device.type == "cuda"
+        self.autocast_kwargs: Dict[str, Any] = {"enabled": self.use_amp}
+        if (
+            self.use_amp
+            and "dtype" in inspect.signature(torch.cuda.amp.autocast).parameters
+            and torch.cuda.get_device_capability(self.device)[0] >= 8
+        ):
+            self.autocast_kwargs["dtype"] = torch.bfloat16
+        self.grad_scaler = torch.cuda.amp.GradScaler(
+            enabled=self.use_amp and "dtype" not in self.autocast_kwargs
+        )
+
+        if self.training_pipeline.use_rollout_cuda_graph:
+            if RolloutCUDAGraph.is_available(self.device):
+                self.rollout_cuda_graph = RolloutCUDAGraph(self.actor_critic)
+            else:
+                get_logger().warning(
+                    "CUDA graphs are unavailable for device {}, rollouts will use"
+                    " regular forward calls.".format(self.device)
+                )
+
+        # Quantized kernels are only available on CPU
+        self.quantized_actor_critic: Optional[nn.Module] = None
+        self.rollout_quantization_interval: Optional[int] = None
+        if self.training_pipeline.rollout_quantization_interval is not None:
+            if self.device.type == "cpu":
+                self.rollout_quantization_interval = (
+                    self.training_pipeline.rollout_quantization_interval
+                )
+            else:
+                get_logger().warning(
+                    "Quantized rollouts are only supported on CPU, rollouts on device {}"
+                    " will use the full precision model.".format(self.device)
+                )
+
         # noinspection PyProtectedMember
         self.lr_scheduler: Optional[optim.lr_scheduler._LRScheduler] = None
         if self.training_pipeline.lr_scheduler_builder is not None:
@@ -640,6 +696,9 @@ class OnPolicyTrainer(OnPolicyRLEngine):
                 _LRScheduler, self.lr_scheduler
             ).state_dict()
 
+        if self.grad_scaler.is_enabled():
+            save_dict["grad_scaler_state"] = self.grad_scaler.state_dict()
+
         torch.save(save_dict, model_path)
         return model_path
 
@@ -658,6 +717,8 @@ class OnPolicyTrainer(OnPolicyRLEngine):
             self.optimizer.load_state_dict(ckpt["optimizer_state_dict"])  # type: ignore
             if self.lr_scheduler is not None:
                 self.lr_scheduler.load_state_dict(ckpt["scheduler_state"])  # type: ignore
+            if self.grad_scaler.is_enabled() and "grad_scaler_state" in ckpt:
+                self.grad_scaler.load_state_dict(ckpt["grad_scaler_state"])  # type: ignore
 
         self.deterministic_seeds()
 
@@ -726,6 +787,22 @@ class OnPolicyTrainer(OnPolicyRLEngine):
     def log_interval(self):
         return self.training_pipeline.metric_accumulate_interval
 
+    @property
+    def rollout_actor_critic(
+        self,
+    ) -> Callable[..., Tuple[ActorCriticOutput, Optional[Memory]]]:
+        if self.quantized_actor_critic is not None:
+            return self.quantized_actor_critic
+        return super().rollout_actor_critic
+
+    def quantize_rollout_model(self):
+        """Refreshes the dynamically quantized (INT8) copy of the model used
+        to collect rollouts from the current full precision weights."""
+        quantization = getattr(torch, "ao", torch).quantization
+        self.quantized_actor_critic = quantization.quantize_dynamic(
+            self.actor_critic, {nn.Linear, nn.GRU, nn.LSTM}, dtype=torch.qint8
+        )
+
     def act(self, rollouts: RolloutStorage):
         actions, actor_critic_output, memory, step_observation = super().act(
             rollouts=rollouts
@@ -768,46 +845,55 @@ class OnPolicyTrainer(OnPolicyRLEngine):
     def update(self, rollouts: RolloutStorage):
         advantages = rollouts.returns[:-1] - rollouts.value_preds[:-1]
 
+        num_mini_batch = self.training_pipeline.num_mini_batch
+        accumulation_steps = self.training_pipeline.gradient_accumulation_steps
+
         for e in range(self.training_pipeline.update_repeats):
-            data_generator = rollouts.recurrent_generator(
-                advantages, self.training_pipeline.num_mini_batch
-            )
+            data_generator = rollouts.recurrent_generator(advantages, num_mini_batch)
 
             for bit, batch in enumerate(data_generator):
+                # Mini-batches are grouped into chunks of `accumulation_steps`, the
+                # last chunk may be smaller if `num_mini_batch` is not divisible
+                chunk_start = bit - bit % accumulation_steps
+                chunk_size = min(accumulation_steps, num_mini_batch - chunk_start)
+
                 # masks is always [steps, samplers, agents, 1]:
                 num_rollout_steps, num_samplers = batch["masks"].shape[:2]
                 bsize = num_rollout_steps * num_samplers
 
-                actor_critic_output, memory = self.actor_critic(
-                    observations=batch["observations"],
-                    memory=batch["memory"],
-                    prev_actions=batch["prev_actions"],
-                    masks=batch["masks"],
-                )
-
-                info: Dict[str, float] = {
-                    "lr": self.optimizer.param_groups[0]["lr"]  # type: ignore
-                }
-
-                total_loss: Optional[torch.Tensor] = None
-                for loss_name in self.training_pipeline.current_stage_losses:
-                    loss, loss_weight = (
-                        self.training_pipeline.current_stage_losses[loss_name],
-                        self.training_pipeline.current_stage_loss_weights[loss_name],
+                with torch.cuda.amp.autocast(**self.autocast_kwargs):
+                    actor_critic_output, memory = self.actor_critic(
+                        observations=batch["observations"],
+                        memory=batch["memory"],
+                        prev_actions=batch["prev_actions"],
+                        masks=batch["masks"],
                     )
 
-                    current_loss, current_info = loss.loss(
-                        step_count=self.step_count,
-                        batch=batch,
-                        actor_critic_output=actor_critic_output,
-                    )
-                    if total_loss is None:
-                        total_loss = loss_weight * current_loss
-                    else:
-                        total_loss = total_loss + loss_weight * current_loss
+                    info: Dict[str, float] = {
+                        "lr": self.optimizer.param_groups[0]["lr"]  # type: ignore
+                    }
+
+                    total_loss: Optional[torch.Tensor] = None
+                    for loss_name in self.training_pipeline.current_stage_losses:
+                        loss, loss_weight = (
+                            self.training_pipeline.current_stage_losses[loss_name],
+                            self.training_pipeline.current_stage_loss_weights[
+                                loss_name
+                            ],
+                        )
+
+                        current_loss, current_info = loss.loss(
+                            step_count=self.step_count,
+                            batch=batch,
+                            actor_critic_output=actor_critic_output,
+                        )
+                        if total_loss is None:
+                            total_loss = loss_weight * current_loss
+                        else:
+                            total_loss = total_loss + loss_weight * current_loss
 
-                    for key in current_info:
-                        info[loss_name + "/" + key] = current_info[key]
+                        for key in current_info:
+                            info[loss_name + "/" + key] = current_info[key]
 
                 assert (
                     total_loss is not None
@@ -818,7 +904,11 @@ class OnPolicyTrainer(OnPolicyRLEngine):
                 info["total_loss"] = total_loss.item()
                 self.tracking_info["update"].append(("update_package", info, bsize))
 
-                self.backprop_step(total_loss)
+                self.backprop_step(
+                    total_loss / chunk_size,
+                    zero_grad=bit == chunk_start,
+                    step_optimizer=bit == chunk_start + chunk_size - 1,
+                )
 
         # # TODO Unit test to ensure correctness of distributed infrastructure
         # state_dict = self.actor_critic.state_dict()
@@ -862,10 +952,17 @@ class OnPolicyTrainer(OnPolicyRLEngine):
 
         return offpolicy_iterator
 
-    def backprop_step(self, total_loss):
-        self.optimizer.zero_grad()  # type: ignore
+    def backprop_step(
+        self, total_loss, zero_grad: bool = True, step_optimizer: bool = True
+    ):
+        if zero_grad:
+            self.optimizer.zero_grad()  # type: ignore
         if isinstance(total_loss, torch.Tensor):
-            total_loss.backward()
+            self.grad_scaler.scale(total_loss).backward()
+
+        if not step_optimizer:
+            # Accumulate gradients until the optimizer step is requested
+            return
 
         if self.is_distributed:
             # From https://github.com/pytorch/pytorch/issues/43135
@@ -881,10 +978,13 @@ class OnPolicyTrainer(OnPolicyRLEngine):
             for reduction in reductions:
                 reduction.wait()
 
+        # Gradients must be unscaled before clipping (a no-op without float16 amp)
+        self.grad_scaler.unscale_(self.optimizer)
         nn.utils.clip_grad_norm_(
             self.actor_critic.parameters(), self.training_pipeline.max_grad_norm,  # type: ignore
         )
-        self.optimizer.step()  # type: ignore
+        self.grad_scaler.step(self.optimizer)
+        self.grad_scaler.update()
 
     def offpolicy_update(
         self,
@@ -1056,6 +1156,14 @@ class OnPolicyTrainer(OnPolicyRLEngine):
             if self.training_pipeline.current_stage is None:
                 break
 
+            if self.rollout_quantization_interval is not None and (
+                self.quantized_actor_critic is None
+                or self.training_pipeline.rollout_count
+                % self.rollout_quantization_interval
+                == 0
+            ):
+                self.quantize_rollout_model()
+
             if self.is_distributed:
                 self.num_workers_done.set("done", str(0))
                 self.num_workers_steps.set("steps", str(0))
@@ -0,0 +1,247 @@
+"""Defines `RolloutCUDAGraph`, used to replay the rollout forward pass of an
+actor critic model as a single CUDA graph."""
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple, Union, cast
+
+import torch
+import torch.distributions  # type: ignore
+from torch import nn
+
+from core.base_abstractions.misc import ActorCriticOutput, Memory
+from utils.system import get_logger
+
+
+@contextmanager
+def _distribution_validation_disabled():
+    """Disables the (default) argument validation of
+    `torch.distributions`, which synchronizes with the host and is
+    therefore not allowed while capturing CUDA graphs."""
+    distribution_cls = torch.distributions.Distribution
+    validate_args = distribution_cls._validate_args
+    distribution_cls._validate_args = False
+    try:
+        yield
+    finally:
+        distribution_cls._validate_args = validate_args
+
+
+class RolloutCUDAGraph(object):
+    """Captures the (gradient-free) forward pass used during rollout
+    collection into a `torch.cuda.CUDAGraph` and replays it on subsequent
+    calls, so that each environment step only requires a single graph launch
+    instead of dozens of individual kernel launches.
+
+    The graph reads its inputs from static tensors (refreshed by in-place copies before every replay)
+    and parameters are read in place, so optimizer updates are seen by the graph without recapturing.
+    The graph is (re)captured whenever the input shapes change (e.g. when some samplers are paused).
+    Models whose distributions are not `Categorical`-like (i.e. cannot be rebuilt from `logits`),
+    or whose forward pass cannot be captured, fall back to regular (eager) forward calls.
+
+    # Attributes
+
+    actor_critic : The model whose forward pass is captured.
+    num_warmup_iters : The number of eager forward passes run in a side stream before capturing.
+    """
+
+    def __init__(self, actor_critic: nn.Module, num_warmup_iters: int = 3):
+        self.actor_critic = actor_critic
+        self.num_warmup_iters = num_warmup_iters
+
+        self.graph: Optional[Any] = None
+        self._signature: Optional[Tuple] = None
+        self._static_inputs: Optional[Tuple] = None
+        self._static_input_leaves: List[torch.Tensor] = []
+        self._static_outputs: Optional[
+            Tuple[ActorCriticOutput, Optional[Memory]]
+        ] = None
+        self._supported = True
+
+    @staticmethod
+    def is_available(device: Union[str, torch.device]) -> bool:
+        """Whether CUDA graphs can be used with the installed torch on
+        `device`."""
+        return (
+            hasattr(torch.cuda, "CUDAGraph")
+            and hasattr(torch.cuda, "graph")
+            and torch.device(device).type == "cuda"
+        )
+
+    @staticmethod
+    def _leaves(
+        observations: Dict[str, Any],
+        memory: Optional[Memory],
+        prev_actions: torch.Tensor,
+        masks: torch.Tensor,
+    ) -> List[torch.Tensor]:
+        leaves: List[torch.Tensor] = []
+
+        def add_observations(obs: Dict[str, Any]):
+            for key in sorted(obs.keys()):
+                if isinstance(obs[key], dict):
+                    add_observations(obs[key])
+                else:
+                    leaves.append(obs[key])
+
+        add_observations(observations)
+        if memory is not None:
+            for key in sorted(memory.keys()):
+                leaves.append(memory.tensor(key))
+        leaves.extend([prev_actions, masks])
+
+        return leaves
+
+    @staticmethod
+    def _signature_of(
+        observations: Dict[str, Any],
+        memory: Optional[Memory],
+        leaves: List[torch.Tensor],
+    ) -> Tuple:
+        def keys_of(obs: Dict[str, Any]) -> Tuple:
+            return tuple(
+                (key, keys_of(obs[key]) if isinstance(obs[key], dict) else None)
+                for key in sorted(obs.keys())
+            )
+
+        return (
+            keys_of(observations),
+            None
+            if memory is None
+            else tuple((key, memory.sampler_dim(key)) for key in sorted(memory)),
+            tuple((leaf.shape, leaf.dtype, leaf.device) for leaf in leaves),
+        )
+
+    @staticmethod
+    def _clone_inputs(
+        observations: Dict[str, Any],
+        memory: Optional[Memory],
+        prev_actions: torch.Tensor,
+        masks: torch.Tensor,
+    ) -> Tuple[Dict[str, Any], Optional[Memory], torch.Tensor, torch.Tensor]:
+        def clone_observations(obs: Dict[str, Any]) -> Dict[str, Any]:
+            return {
+                key: clone_observations(obs[key])
+                if isinstance(obs[key], dict)
+                else obs[key].clone()
+                for key in obs
+            }
+
+        static_memory: Optional[Memory] = None
+        if memory is not None:
+            static_memory = Memory(
+                [
+                    (key, (memory.tensor(key).clone(), memory.sampler_dim(key)))
+                    for key in memory
+                ]
+            )
+
+        return (
+            clone_observations(observations),
+            static_memory,
+            prev_actions.clone(),
+            masks.clone(),
+        )
+
+    def _capture(self, inputs: Tuple):
+        self._static_inputs = self._clone_inputs(*inputs)
+        self._static_input_leaves = self._leaves(*self._static_inputs)
+
+        with _distribution_validation_disabled():
+            # Warm up in a side stream (as required before capturing), this also
+            # lets us check whether the model outputs can be rebuilt after replays
+            side_stream = torch.cuda.Stream()
+            side_stream.wait_stream(torch.cuda.current_stream())
+            with torch.cuda.stream(side_stream):
+                for _ in range(self.num_warmup_iters):
+                    actor_critic_output, _ = self.actor_critic(*self._static_inputs)
+            torch.cuda.current_stream().wait_stream(side_stream)
+
+            if not isinstance(
+                actor_critic_output.distributions, torch.distributions.Categorical
+            ):
+                self._supported = False
+                return
+
+            self.graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(self.graph):
+                self._static_outputs = self.actor_critic(*self._static_inputs)
+
+    def _outputs(self) -> Tuple[ActorCriticOutput, Optional[Memory]]:
+        static_output, static_memory = cast(
+            Tuple[ActorCriticOutput, Optional[Memory]], self._static_outputs
+        )
+
+        # Outputs are cloned since the next replay overwrites the static ones
+        distributions = type(static_output.distributions)(
+            logits=static_output.distributions.logits.clone()
+        )
+        extras = (
+            {
+                key: val.clone() if isinstance(val, torch.Tensor) else val
+                for key, val in static_output.extras.items()
+            }
+            if isinstance(static_output.extras, dict)
+            else static_output.extras
+        )
+        memory: Optional[Memory] = None
+        if static_memory is not None:
+            memory = Memory(
+                [
+                    (
+                        key,
+                        (
+                            static_memory.tensor(key).clone(),
+                            static_memory.sampler_dim(key),
+                        ),
+                    )
+                    for key in static_memory
+                ]
+            )
+
+        return (
+            ActorCriticOutput(
+                distributions=distributions,
+                values=static_output.values.clone(),
+                extras=extras,
+            ),
+            memory,
+        )
+
+    def __call__(
+        self,
+        observations: Dict[str, Any],
+        memory: Optional[Memory],
+        prev_actions: torch.Tensor,
+        masks: torch.Tensor,
+    ) -> Tuple[ActorCriticOutput, Optional[Memory]]:
+        inputs = (observations, memory, prev_actions, masks)
+
+        if not self._supported:
+            return self.actor_critic(*inputs)
+
+        leaves = self._leaves(*inputs)
+        signature = self._signature_of(observations, memory, leaves)
+        if signature != self._signature:
+            self.graph = None
+            self._static_outputs = None
+            self._signature = signature
+            try:
+                self._capture(inputs)
+            except Exception:
+                get_logger().warning(
+                    "Failed to capture the rollout forward pass into a CUDA graph,"
+                    " using regular forward calls instead.",
+                    exc_info=True,
+                )
+                self._supported = False
+            if not self._supported:
+                self.graph = None
+                self._static_inputs = None
+                self._static_input_leaves = []
+                self._static_outputs = None
+                return self.actor_critic(*inputs)
+
+        for static_leaf, leaf in zip(self._static_input_leaves, leaves):
+            static_leaf.copy_(leaf, non_blocking=True)
+        self.graph.replay()
+
+        return self._outputs()
@@ -1,11 +1,9 @@
 # Copyright (c) Facebook, Inc. and its affiliates.
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
-import random
 from collections import defaultdict
 from typing import Union, List, Dict, Tuple, DefaultDict, Sequence, cast, Optional
 
-import numpy as np
 import torch
 
 from core.algorithms.onpolicy_sync.policy import (
@@ -18,7 +16,13 @@ from utils.system import get_logger
 
 
 class RolloutStorage(object):
-    """Class for storing rollout information for RL trainers."""
+    """Class for storing rollout information for RL trainers.
+
+    All tensors are laid out as `[step, sampler, ...]` and are only
+    written by the trainer process owning the storage (sampler processes
+    send their observations through pipes), so each step results in a
+    single contiguous write covering all samplers.
+    """
 
     FLATTEN_SEPARATOR: str = "._AUTOFLATTEN_."
 
@@ -165,16 +169,17 @@ class RolloutStorage(object):
             flatten_name = prefix + name
             if flatten_name not in storage:
                 assert storage_name == "observations"
+                # Allocated directly on the storage device (rather than repeating
+                # `current_data` and moving the result) so that no intermediate
+                # buffer is materialized and copied across devices
                 storage[flatten_name] = (
-                    torch.zeros_like(current_data)  # type:ignore
-                    .repeat(
+                    torch.zeros(
                         self.num_steps + 1,  # required for observations (and memory)
-                        *(1 for _ in range(len(current_data.shape))),
-                    )
-                    .to(
-                        torch.device("cpu")
+                        *current_data.shape,  # type:ignore
+                        dtype=current_data.dtype,  # type:ignore
+                        device=torch.device("cpu")
                         if self.actions.get_device() < 0
-                        else self.actions.get_device()
+                        else self.actions.get_device(),
                     ),
                     sampler_dim,
                 )
@@ -357,50 +362,31 @@ class RolloutStorage(object):
             "mini batches ({}).".format(num_samplers, num_mini_batch)
         )
 
-        inds = np.round(
-            np.linspace(0, num_samplers, num_mini_batch + 1, endpoint=True)
-        ).astype(np.int32)
-        pairs = list(zip(inds[:-1], inds[1:]))
-        random.shuffle(pairs)
+        # Mini-batches are contiguous ranges of samplers, so their data is taken
+        # with a single slice along the sampler dimension (instead of gathering
+        # and stacking samplers one by one)
+        inds = [i * num_samplers // num_mini_batch for i in range(num_mini_batch + 1)]
 
-        for start_ind, end_ind in pairs:
-            cur_samplers = list(range(start_ind, end_ind))
+        for batch_ind in torch.randperm(num_mini_batch).tolist():
+            start_ind, end_ind = inds[batch_ind], inds[batch_ind + 1]
 
-            memory_batch = self.memory.step_squeeze(0).sampler_select(cur_samplers)
+            memory_batch = self._sampler_slice(
+                self.memory.step_squeeze(0), start_ind, end_ind
+            )
             observations_batch = self.unflatten_observations(
-                self.observations.slice(dim=0, stop=-1).sampler_select(cur_samplers)
+                self._sampler_slice(self.observations, start_ind, end_ind, step_stop=-1)
             )
 
-            actions_batch = []
-            prev_actions_batch = []
-            value_preds_batch = []
-            return_batch = []
-            masks_batch = []
-            old_action_log_probs_batch = []
-            adv_targ = []
-            norm_adv_targ = []
-
-            for ind in cur_samplers:
-                actions_batch.append(self.actions[:, ind])
-                prev_actions_batch.append(self.prev_actions[:-1, ind])
-                value_preds_batch.append(self.value_preds[:-1, ind])
-                return_batch.append(self.returns[:-1, ind])
-                masks_batch.append(self.masks[:-1, ind])
-                old_action_log_probs_batch.append(self.action_log_probs[:, ind])
-
-                adv_targ.append(advantages[:, ind])
-                norm_adv_targ.append(normalized_advantages[:, ind])
-
-            actions_batch = torch.stack(actions_batch, 1)  # type:ignore
-            prev_actions_batch = torch.stack(prev_actions_batch, 1)  # type:ignore
-            value_preds_batch = torch.stack(value_preds_batch, 1)  # type:ignore
-            return_batch = torch.stack(return_batch, 1)  # type:ignore
-            masks_batch = torch.stack(masks_batch, 1)  # type:ignore
-            old_action_log_probs_batch = torch.stack(  # type:ignore
-                old_action_log_probs_batch, 1
-            )
-            adv_targ = torch.stack(adv_targ, 1)  # type:ignore
-            norm_adv_targ = torch.stack(norm_adv_targ, 1)  # type:ignore
+            actions_batch = self.actions[:, start_ind:end_ind].contiguous()
+            prev_actions_batch = self.prev_actions[:-1, start_ind:end_ind].contiguous()
+            value_preds_batch = self.value_preds[:-1, start_ind:end_ind].contiguous()
+            return_batch = self.returns[:-1, start_ind:end_ind].contiguous()
+            masks_batch = self.masks[:-1, start_ind:end_ind].contiguous()
+            old_action_log_probs_batch = self.action_log_probs[
+                :, start_ind:end_ind
+            ].contiguous()
+            adv_targ = advantages[:, start_ind:end_ind].contiguous()
+            norm_adv_targ = normalized_advantages[:, start_ind:end_ind].contiguous()
 
             yield {
                 "observations": observations_batch,
@@ -415,6 +401,24 @@ class RolloutStorage(object):
                 "norm_adv_targ": norm_adv_targ,
             }
 
+    @staticmethod
+    def _sampler_slice(
+        storage: Memory, start: int, end: int, step_stop: Optional[int] = None
+    ) -> Memory:
+        """Selects the samplers in `[start, end)` (and the steps before
+        `step_stop`, if given) of each tensor in `storage`."""
+        res = Memory()
+        for key in storage:
+            sampler_dim = storage.sampler_dim(key)
+            res.check_append(
+                key,
+                storage.tensor(key)[:step_stop]
+                .narrow(dim=sampler_dim, start=start, length=end - start)
+                .contiguous(),
+                sampler_dim,
+            )
+        return res
+
     def unflatten_observations(self, flattened_batch: Memory) -> ObservationType:
         result: ObservationType = {}
         for name in flattened_batch:
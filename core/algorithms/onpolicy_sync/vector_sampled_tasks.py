@@ -20,10 +20,12 @@ from typing import (
     Dict,
     Generator,
     Iterator,
+    NamedTuple,
     cast,
 )
 
 import numpy as np
+import torch
 from gym.spaces.dict import Dict as SpaceDict
 from setproctitle import setproctitle as ptitle
 
@@ -60,6 +62,107 @@ SEED_COMMAND = "seed"
 PAUSE_COMMAND = "pause"
 RESUME_COMMAND = "resume"
 
+# Arrays sent by worker processes are only moved through shared memory
+# if they are at least this large (e.g. frames, but not goal indices)
+SHARED_MEMORY_MIN_NBYTES = 2 ** 14
+
+
+class _SharedArray(NamedTuple):
+    """Placeholder sent (instead of an array) through a pipe, the array
+    data is found in the shared memory buffer `slot` of the sender, whose
+    tensor is only sent along when the buffer is (re)allocated."""
+
+    slot: int
+    tensor: Optional[torch.Tensor]
+
+
+class SharedMemorySender(object):
+    """Wraps the send function of a worker's connection so that (large)
+    numpy arrays in the sent data (e.g. observations nested in lists, tuples
+    and dicts) are written into shared memory buffers, reused across calls,
+    instead of being pickled and copied through the pipe.
+
+    Must be paired with a `SharedMemoryReceiver` on the other end of the connection.
+    """
+
+    def __init__(
+        self,
+        send_fn: Callable[[Any], None],
+        min_nbytes: int = SHARED_MEMORY_MIN_NBYTES,
+    ):
+        self.send_fn = send_fn
+        self.min_nbytes = min_nbytes
+        self._buffers: List[np.ndarray] = []
+        self._next_slot = 0
+
+    def __call__(self, data: Any) -> None:
+        self._next_slot = 0
+        self.send_fn(self._encode(data))
+
+    def _encode(self, data: Any) -> Any:
+        if isinstance(data, np.ndarray):
+            if data.nbytes < self.min_nbytes:
+                return data
+            return self._to_shared(data)
+        elif isinstance(data, tuple) and hasattr(data, "_fields"):  # NamedTuple
+            return type(data)(*(self._encode(v) for v in data))
+        elif type(data) in (list, tuple):
+            return type(data)(self._encode(v) for v in data)
+        elif type(data) == dict:
+            return {k: self._encode(v) for k, v in data.items()}
+        return data
+
+    def _to_shared(self, data: np.ndarray) -> Any:
+        slot = self._next_slot
+
+        tensor: Optional[torch.Tensor] = None
+        if (
+            slot >= len(self._buffers)
+            or self._buffers[slot].shape != data.shape
+            or self._buffers[slot].dtype != data.dtype
+        ):
+            try:
+                tensor = torch.from_numpy(np.ascontiguousarray(data)).clone()
+            except TypeError:  # dtype not supported by torch
+                return data
+            tensor.share_memory_()
+            if slot < len(self._buffers):
+                self._buffers[slot] = tensor.numpy()
+            else:
+                self._buffers.append(tensor.numpy())
+        else:
+            np.copyto(self._buffers[slot], data)
+
+        self._next_slot += 1
+        return _SharedArray(slot=slot, tensor=tensor)
+
+
+class SharedMemoryReceiver(object):
+    """Wraps the receive function of a connection whose other end uses a
+    `SharedMemorySender`, replacing placeholders by copies of the arrays in
+    shared memory (so that received data is never overwritten by
+    subsequent calls)."""
+
+    def __init__(self, recv_fn: Callable[[], Any]):
+        self.recv_fn = recv_fn
+        self._buffers: Dict[int, np.ndarray] = {}
+
+    def __call__(self) -> Any:
+        return self._decode(self.recv_fn())
+
+    def _decode(self, data: Any) -> Any:
+        if isinstance(data, _SharedArray):
+            if data.tensor is not None:
+                self._buffers[data.slot] = data.tensor.numpy()
+            return self._buffers[data.slot].copy()
+        elif isinstance(data, tuple) and hasattr(data, "_fields"):  # NamedTuple
+            return type(data)(*(self._decode(v) for v in data))
+        elif type(data) in (list, tuple):
+            return type(data)(self._decode(v) for v in data)
+        elif type(data) == dict:
+            return {k: self._decode(v) for k, v in data.items()}
+        return data
+
 
 class VectorSampledTasks(object):
     """Vectorized collection of tasks. Creates multiple processes where each
@@ -84,6 +187,9 @@ class VectorSampledTasks(object):
         recommended method as it works well with CUDA. If
         ``'fork'`` is used, the subproccess  must be started before
         any other GPU useage.
+    shared_memory_observations : if True, (large) arrays returned by the worker processes (e.g.
+        visual observations) are written into shared memory buffers instead of being pickled and
+        sent through the processes' pipes.
     """
 
     observation_space: SpaceDict
@@ -104,12 +210,14 @@ class VectorSampledTasks(object):
         mp_ctx: Optional[BaseContext] = None,
         should_log: bool = True,
         max_processes: Optional[int] = None,
+        shared_memory_observations: bool = False,
     ) -> None:
 
         self._is_waiting = False
         self._is_closed = True
         self.should_log = should_log
         self.max_processes = max_processes
+        self.shared_memory_observations = shared_memory_observations
 
         assert (
             sampler_fn_args is not None and len(sampler_fn_args) > 0
@@ -243,12 +351,16 @@ class VectorSampledTasks(object):
         should_log: bool,
         child_pipe: Optional[Connection] = None,
         parent_pipe: Optional[Connection] = None,
+        shared_memory_observations: bool = False,
     ) -> None:
         """process worker for creating and interacting with the
         Tasks/TaskSampler."""
 
         ptitle("VectorSampledTask: {}".format(worker_id))
 
+        if shared_memory_observations:
+            connection_write_fn = SharedMemorySender(connection_write_fn)
+
         sp_vector_sampled_tasks = SingleProcessVectorSampledTasks(
             make_sampler_fn=make_sampler_fn,
             sampler_fn_args_list=sampler_fn_args_list,
@@ -357,6 +469,7 @@ class VectorSampledTasks(object):
                     self.should_log,
                     worker_conn,
                     parent_conn,
+                    self.shared_memory_observations,
                 ),
             )
             self._workers.append(ps)
@@ -367,7 +480,12 @@ class VectorSampledTasks(object):
                 0.1
             )  # Useful to ensure things don't lock up when spawning many envs
         return (
-            [p.recv for p in parent_connections],
+            [
+                SharedMemoryReceiver(p.recv)
+                if self.shared_memory_observations
+                else p.recv
+                for p in parent_connections
+            ],
             [p.send for p in parent_connections],
         )
 
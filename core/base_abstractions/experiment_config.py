@@ -29,6 +29,7 @@ class MachineParams(object):
         ] = None,
         visualizer: Optional[Union[VizSuite, Builder[VizSuite]]] = None,
         gpu_ids: Union[int, Sequence[int]] = None,
+        shared_memory_observations: bool = False,
     ):
         assert (
             gpu_ids is None or devices is None
@@ -54,6 +55,7 @@ class MachineParams(object):
             devices=sampler_devices, nworkers=len(self.nprocesses)
         )
         self._visualizer_maybe_builder = visualizer
+        self.shared_memory_observations = shared_memory_observations
 
         self._observation_set_cached: Optional[ObservationSet] = None
         self._visualizer_cached: Optional[VizSuite] = None
@@ -0,0 +1,209 @@
+import os
+from abc import ABC
+from functools import lru_cache
+from math import ceil
+from typing import Dict, Any, List, Optional, Type, Sequence, Tuple
+
+import gym
+import torch
+
+from core.base_abstractions.experiment_config import ExperimentConfig
+from core.base_abstractions.sensor import SensorSuite, Sensor
+from core.base_abstractions.task import Task
+
+
+class ThorExperimentConfigBase(ExperimentConfig, ABC):
+    """Base config for iTHOR experiments whose train/valid/test task
+    samplers are each given a split of a list of scenes.
+
+    Subclasses are expected to define (at least) `SENSORS`, `ENV_ARGS`,
+    `TASK_TYPE` (used to derive the action space), the scenes and object types as
+    well as `tag`, `training_pipeline`, `create_model` and `make_sampler_fn`.
+    """
+
+    OBJECT_TYPES: List[str] = []
+    TRAIN_SCENES: List[str] = []
+    VALID_SCENES: List[str] = []
+    TEST_SCENES: List[str] = []
+
+    SENSORS: Sequence[Sensor] = []
+    ENV_ARGS: Dict[str, Any] = {}
+    TASK_TYPE: Type[Task]
+
+    MAX_STEPS = 128
+    ADVANCE_SCENE_ROLLOUT_PERIOD: Optional[int] = None
+    VALID_SAMPLES_IN_SCENE = 10
+    TEST_SAMPLES_IN_SCENE = 100
+
+    @classmethod
+    def machine_params(cls, mode="train", nprocesses: Optional[int] = None, **kwargs):
+        num_gpus = torch.cuda.device_count()
+        has_gpu = num_gpus != 0
+
+        sampler_devices: Optional[List[int]] = None
+        if mode == "train":
+            if nprocesses is None:
+                # One iTHOR process per available cpu core (at most 20), but never
+                # fewer than the number of samplers required by the training pipeline
+                nprocesses = max(
+                    min(20 if has_gpu else 4, os.cpu_count() or 1),
+                    cls._min_train_processes(),
+                )
+            num_scenes = len(cls.TRAIN_SCENES)
+            if num_scenes > 0 and (
+                nprocesses % num_scenes != 0
+                if nprocesses > num_scenes
+                else num_scenes % nprocesses != 0
+            ):
+                print(
+                    "Warning: {} training processes cannot evenly split {} training scenes,"
+                    " some of the scenes will be oversampled.".format(
+                        nprocesses, num_scenes
+                    )
+                )
+            gpu_ids = [0] if has_gpu else []
+            # Samplers' x_display is assigned round-robin over these devices
+            sampler_devices = gpu_ids if has_gpu else None
+        elif mode == "valid":
+            nprocesses = 1
+            gpu_ids = [1 % num_gpus] if has_gpu else []
+        elif mode == "test":
+            nprocesses = 1
+            gpu_ids = [0] if has_gpu else []
+        else:
+            raise NotImplementedError("mode must be 'train', 'valid', or 'test'.")
+
+        return {
+            "nprocesses": nprocesses,
+            "gpu_ids": gpu_ids,
+            "sampler_devices": sampler_devices,
+            # Frames are passed from the iTHOR processes through shared memory
+            "shared_memory_observations": True,
+        }
+
+    @classmethod
+    def _min_train_processes(cls) -> int:
+        """The minimum number of training samplers (e.g. the number of mini-
+        batches rollouts are split into by the training pipeline)."""
+        return 1
+
+    # Spaces are built once per (sub)class, class variables of experiment
+    # configs are frozen so they are cached rather than assigned
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _action_space(cls) -> gym.spaces.Discrete:
+        return gym.spaces.Discrete(len(cls.TASK_TYPE.class_action_names()))
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _observation_spaces(cls) -> gym.spaces.Dict:
+        return SensorSuite(cls.SENSORS).observation_spaces
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _partition_inds(n: int, num_parts: int) -> Tuple[int, ...]:
+        # Only a handful of (n, num_parts) pairs occur per experiment
+        return tuple(i * n // num_parts for i in range(num_parts + 1))
+
+    def _get_sampler_args_for_scene_split(
+        self,
+        scenes: List[str],
+        process_ind: int,
+        total_processes: int,
+        devices: Optional[List[int]] = None,
+        seeds: Optional[List[int]] = None,
+        deterministic_cudnn: bool = False,
+    ) -> Dict[str, Any]:
+        if total_processes > len(scenes):  # oversample some scenes -> bias
+            if total_processes % len(scenes) != 0:
+                print(
+                    "Warning: oversampling some of the scenes to feed all processes."
+                    " You can avoid this by setting a number of workers divisible by the number of scenes"
+                )
+            scenes = scenes * int(ceil(total_processes / len(scenes)))
+            scenes = scenes[: total_processes * (len(scenes) // total_processes)]
+        else:
+            if len(scenes) % total_processes != 0:
+                print(
+                    "Warning: oversampling some of the scenes to feed all processes."
+                    " You can avoid this by setting a number of workers divisor of the number of scenes"
+                )
+        inds = self._partition_inds(len(scenes), total_processes)
+
+        num_devices = len(devices) if devices is not None else 0
+        env_args: Dict[str, Any] = {
+            **self.ENV_ARGS,
+            "x_display": f"0.{devices[process_ind % num_devices]}"
+            if num_devices > 0
+            else None,
+        }
+
+        return {
+            "scenes": scenes[inds[process_ind] : inds[process_ind + 1]],
+            "object_types": self.OBJECT_TYPES,
+            "env_args": env_args,
+            "max_steps": self.MAX_STEPS,
+            "sensors": self.SENSORS,
+            "action_space": self._action_space(),
+            "seed": seeds[process_ind] if seeds is not None else None,
+            "deterministic_cudnn": deterministic_cudnn,
+        }
+
+    def train_task_sampler_args(
+        self,
+        process_ind: int,
+        total_processes: int,
+        devices: Optional[List[int]] = None,
+        seeds: Optional[List[int]] = None,
+        deterministic_cudnn: bool = False,
+    ) -> Dict[str, Any]:
+        res = self._get_sampler_args_for_scene_split(
+            self.TRAIN_SCENES,
+            process_ind,
+            total_processes,
+            devices=devices,
+            seeds=seeds,
+            deterministic_cudnn=deterministic_cudnn,
+        )
+        res["scene_period"] = "manual"
+        return res
+
+    def valid_task_sampler_args(
+        self,
+        process_ind: int,
+        total_processes: int,
+        devices: Optional[List[int]] = None,
+        seeds: Optional[List[int]] = None,
+        deterministic_cudnn: bool = False,
+    ) -> Dict[str, Any]:
+        res = self._get_sampler_args_for_scene_split(
+            self.VALID_SCENES,
+            process_ind,
+            total_processes,
+            devices=devices,
+            seeds=seeds,
+            deterministic_cudnn=deterministic_cudnn,
+        )
+        res["scene_period"] = self.VALID_SAMPLES_IN_SCENE
+        res["max_tasks"] = self.VALID_SAMPLES_IN_SCENE * len(res["scenes"])
+        return res
+
+    def test_task_sampler_args(
+        self,
+        process_ind: int,
+        total_processes: int,
+        devices: Optional[List[int]] = None,
+        seeds: Optional[List[int]] = None,
+        deterministic_cudnn: bool = False,
+    ) -> Dict[str, Any]:
+        res = self._get_sampler_args_for_scene_split(
+            self.TEST_SCENES,
+            process_ind,
+            total_processes,
+            devices=devices,
+            seeds=seeds,
+            deterministic_cudnn=deterministic_cudnn,
+        )
+        res["scene_period"] = self.TEST_SAMPLES_IN_SCENE
+        res["max_tasks"] = self.TEST_SAMPLES_IN_SCENE * len(res["scenes"])
+        return res
@@ -37,6 +37,10 @@ class ObjectNavBaselineActorCritic(ActorCriticModel[CategoricalDistr]):
     hidden_size : The hidden size of the GRU RNN.
     object_type_embedding_dim: The dimensionality of the embedding corresponding to the goal
         object type.
+    rgb_resnet_normalization : If `True`, 'rgb' images are normalized (on the model's device) with the
+        standard resnet means `[0.485, 0.456, 0.406]` and standard deviations `[0.229, 0.224, 0.225]`.
+        Use this in place of the sensor-side `use_resnet_normalization`. `uint8` images are
+        additionally rescaled to [0, 1].
     """
 
     def __init__(
@@ -51,6 +55,7 @@ class ObjectNavBaselineActorCritic(ActorCriticModel[CategoricalDistr]):
         trainable_masked_hidden_state: bool = False,
         num_rnn_layers=1,
         rnn_type="GRU",
+        rgb_resnet_normalization: bool = False,
     ):
         """Initializer.
 
@@ -86,6 +91,19 @@ class ObjectNavBaselineActorCritic(ActorCriticModel[CategoricalDistr]):
             embedding_dim=object_type_embedding_dim,
         )
 
+        self.rgb_uuid = rgb_uuid
+        self.rgb_resnet_normalization = (
+            rgb_resnet_normalization and rgb_uuid is not None
+        )
+        if self.rgb_resnet_normalization:
+            # Non-persistent so that checkpoints do not depend on this setting
+            self.register_buffer(
+                "rgb_mean", torch.tensor([0.485, 0.456, 0.406]), persistent=False
+            )
+            self.register_buffer(
+                "rgb_std", torch.tensor([0.229, 0.224, 0.225]), persistent=False
+            )
+
         self.train()
 
     @property
@@ -99,6 +117,13 @@ class ObjectNavBaselineActorCritic(ActorCriticModel[CategoricalDistr]):
         input observation type)."""
         return self.visual_encoder.is_blind
 
+    def normalize_rgb(self, rgb: torch.Tensor) -> torch.Tensor:
+        """Normalize batched (channels last) rgb images with the resnet
+        means and standard deviations."""
+        if rgb.dtype == torch.uint8:
+            rgb = rgb.float().div_(255.0)
+        return (rgb - self.rgb_mean) / self.rgb_std
+
     @property
     def num_recurrent_layers(self) -> int:
         """Number of recurrent hidden layers."""
@@ -153,6 +178,11 @@ class ObjectNavBaselineActorCritic(ActorCriticModel[CategoricalDistr]):
         x = [target_encoding]
 
         if not self.is_blind:
+            if self.rgb_resnet_normalization:
+                observations = {
+                    **observations,
+                    self.rgb_uuid: self.normalize_rgb(observations[self.rgb_uuid]),
+                }
             perception_embed = self.visual_encoder(observations)
             x = [perception_embed] + x
 
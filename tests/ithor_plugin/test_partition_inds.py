@@ -0,0 +1,35 @@
+import numpy as np
+
+from plugins.ithor_plugin.configs.ithor_base import ThorExperimentConfigBase
+
+
+class TestPartitionInds(object):
+    def test_partition_inds(self):
+        for n in range(1, 41):
+            for num_parts in range(1, 33):
+                inds = ThorExperimentConfigBase._partition_inds(n, num_parts)
+
+                assert isinstance(inds, tuple)
+                assert len(inds) == num_parts + 1
+                assert inds[0] == 0 and inds[-1] == n
+
+                sizes = [end - start for start, end in zip(inds[:-1], inds[1:])]
+                assert min(sizes) >= 0
+                assert max(sizes) - min(sizes) <= 1
+
+                rounded = np.round(
+                    np.linspace(0, n, num_parts + 1, endpoint=True)
+                ).astype(np.int32)
+                for i, (ind, rounded_ind) in enumerate(zip(inds, rounded)):
+                    # Floor division matches rounding whenever the fractional part
+                    # of i * n / num_parts is below one half, and is otherwise
+                    # (at most) one smaller
+                    if 2 * (i * n % num_parts) < num_parts:
+                        assert ind == rounded_ind
+                    else:
+                        assert 0 <= rounded_ind - ind <= 1
+
+    def test_partition_inds_is_cached(self):
+        assert ThorExperimentConfigBase._partition_inds(
+            7, 3
+        ) is ThorExperimentConfigBase._partition_inds(7, 3)
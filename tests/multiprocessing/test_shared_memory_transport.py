@@ -0,0 +1,128 @@
+from typing import List, Any
+
+import numpy as np
+import torch.multiprocessing as mp
+
+from core.algorithms.onpolicy_sync.vector_sampled_tasks import (
+    SHARED_MEMORY_MIN_NBYTES,
+    SharedMemoryReceiver,
+    SharedMemorySender,
+    _SharedArray,
+)
+from core.base_abstractions.misc import RLStepResult
+
+FRAME_SHAPE = (128, 128, 3)  # larger than SHARED_MEMORY_MIN_NBYTES
+
+
+def step_result(value: int, shape=FRAME_SHAPE, dtype=np.uint8) -> RLStepResult:
+    return RLStepResult(
+        observation={
+            "rgb": np.full(shape, value, dtype=dtype),
+            "goal": np.array(value),
+        },
+        reward=float(value),
+        done=False,
+        info={},
+    )
+
+
+class TestSharedMemoryTransport(object):
+    @staticmethod
+    def make_transport():
+        messages: List[Any] = []
+        sender = SharedMemorySender(messages.append)
+        receiver = SharedMemoryReceiver(lambda: messages[-1])
+        return messages, sender, receiver
+
+    def test_encoding(self):
+        assert np.zeros(FRAME_SHAPE, dtype=np.uint8).nbytes >= SHARED_MEMORY_MIN_NBYTES
+
+        messages, sender, receiver = self.make_transport()
+
+        sender([step_result(1)])
+        encoded = messages[-1][0]
+        # NamedTuples are rebuilt with their original type
+        assert isinstance(encoded, RLStepResult)
+        # Large arrays are replaced by placeholders, the first one carrying the buffer
+        assert isinstance(encoded.observation["rgb"], _SharedArray)
+        assert encoded.observation["rgb"].slot == 0
+        assert encoded.observation["rgb"].tensor is not None
+        # Small arrays are still pickled
+        assert isinstance(encoded.observation["goal"], np.ndarray)
+        assert encoded.reward == 1.0
+
+        decoded = receiver()[0]
+        assert isinstance(decoded, RLStepResult)
+        assert decoded.observation["rgb"].shape == FRAME_SHAPE
+        assert (decoded.observation["rgb"] == 1).all()
+        assert decoded.observation["goal"] == 1
+
+    def test_slot_reuse_and_reallocation(self):
+        messages, sender, receiver = self.make_transport()
+
+        sender([step_result(1), step_result(2)])
+        first = messages[-1]
+        assert [r.observation["rgb"].slot for r in first] == [0, 1]
+        assert all(r.observation["rgb"].tensor is not None for r in first)
+        decoded_first = receiver()
+
+        # Same shapes and dtypes: buffers are reused, handles are not resent
+        sender([step_result(3), step_result(4)])
+        second = messages[-1]
+        assert [r.observation["rgb"].slot for r in second] == [0, 1]
+        assert all(r.observation["rgb"].tensor is None for r in second)
+        decoded_second = receiver()
+        assert [int(r.observation["rgb"].mean()) for r in decoded_second] == [3, 4]
+
+        # Previously received arrays are copies, not overwritten by later steps
+        assert [int(r.observation["rgb"].mean()) for r in decoded_first] == [1, 2]
+
+        # A shape change (slot 0) and a dtype change (slot 1) reallocate and resend
+        sender([step_result(5, shape=(96, 128, 3)), step_result(6, dtype=np.float32)])
+        third = messages[-1]
+        assert all(r.observation["rgb"].tensor is not None for r in third)
+        decoded_third = receiver()
+        assert decoded_third[0].observation["rgb"].shape == (96, 128, 3)
+        assert decoded_third[1].observation["rgb"].dtype == np.float32
+        assert [int(r.observation["rgb"].mean()) for r in decoded_third] == [5, 6]
+
+        # Reallocated buffers are in turn reused
+        sender([step_result(7, shape=(96, 128, 3)), step_result(8, dtype=np.float32)])
+        assert all(r.observation["rgb"].tensor is None for r in messages[-1])
+        assert [int(r.observation["rgb"].mean()) for r in receiver()] == [7, 8]
+
+    @staticmethod
+    def worker(connection, num_steps: int):
+        send = SharedMemorySender(connection.send)
+        for step in range(num_steps):
+            connection.recv()
+            send([step_result(step), step_result(step + 100)])
+        connection.close()
+
+    def test_across_processes(self):
+        num_steps = 4
+        for fork_method in ["forkserver", "fork"]:
+            ctxt = mp.get_context(fork_method)
+            parent_connection, worker_connection = ctxt.Pipe(duplex=True)
+            p = ctxt.Process(
+                target=self.worker,
+                kwargs=dict(connection=worker_connection, num_steps=num_steps),
+            )
+            p.start()
+
+            receive = SharedMemoryReceiver(parent_connection.recv)
+            results = []
+            for _ in range(num_steps):
+                parent_connection.send("step")
+                results.append(receive())
+            p.join()
+
+            for step, result in enumerate(results):
+                assert [int(r.observation["rgb"].mean()) for r in result] == [
+                    step,
+                    step + 100,
+                ]
+                assert [int(r.observation["goal"]) for r in result] == [
+                    step,
+                    step + 100,
+                ]
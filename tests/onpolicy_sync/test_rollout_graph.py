@@ -0,0 +1,101 @@
+import gym
+import numpy as np
+import pytest
+import torch
+from gym.spaces.dict import Dict as SpaceDict
+
+from core.algorithms.onpolicy_sync.rollout_graph import RolloutCUDAGraph
+from core.algorithms.onpolicy_sync.storage import RolloutStorage
+from projects.objectnav_baselines.models.object_nav_models import (
+    ObjectNavBaselineActorCritic,
+)
+
+
+@pytest.mark.skipif(
+    not torch.cuda.is_available() or not RolloutCUDAGraph.is_available("cuda"),
+    reason="requires a CUDA device and a torch version supporting CUDA graphs",
+)
+class TestRolloutCUDAGraph(object):
+    NUM_SAMPLERS = 3
+    SCREEN_SIZE = 64
+    NUM_OBJECT_TYPES = 4
+
+    def make_model(self) -> ObjectNavBaselineActorCritic:
+        observation_space = SpaceDict(
+            {
+                "rgb": gym.spaces.Box(
+                    low=0,
+                    high=255,
+                    shape=(self.SCREEN_SIZE, self.SCREEN_SIZE, 3),
+                    dtype=np.uint8,
+                ),
+                "goal_object_type_ind": gym.spaces.Discrete(self.NUM_OBJECT_TYPES),
+            }
+        )
+        return ObjectNavBaselineActorCritic(
+            action_space=gym.spaces.Discrete(6),
+            observation_space=observation_space,
+            goal_sensor_uuid="goal_object_type_ind",
+            rgb_uuid="rgb",
+            depth_uuid=None,
+            hidden_size=32,
+            object_type_embedding_dim=8,
+            rgb_resnet_normalization=True,
+        )
+
+    def random_observations(self, device: torch.device):
+        return {
+            "rgb": torch.randint(
+                0,
+                256,
+                (self.NUM_SAMPLERS, self.SCREEN_SIZE, self.SCREEN_SIZE, 3),
+                dtype=torch.uint8,
+                device=device,
+            ),
+            "goal_object_type_ind": torch.randint(
+                0, self.NUM_OBJECT_TYPES, (self.NUM_SAMPLERS,), device=device
+            ),
+        }
+
+    def test_replay_matches_eager(self):
+        torch.manual_seed(0)
+        device = torch.device("cuda")
+
+        model = self.make_model().to(device)
+        rollouts = RolloutStorage(
+            num_steps=4, num_samplers=self.NUM_SAMPLERS, actor_critic=model
+        )
+        rollouts.to(device)
+
+        graphed = RolloutCUDAGraph(model)
+
+        # Several calls, so that replays (and not only the capture) are checked
+        for step in range(3):
+            rollouts.insert_observations(
+                self.random_observations(device), time_step=step
+            )
+            rollouts.memory.tensor("rnn")[step].normal_()
+            rollouts.masks[step].bernoulli_(0.5)
+
+            inputs = (
+                rollouts.pick_observation_step(step),
+                rollouts.pick_memory_step(step),
+                rollouts.prev_actions[step : step + 1],
+                rollouts.masks[step : step + 1],
+            )
+
+            with torch.no_grad():
+                eager_output, eager_memory = model(*inputs)
+                graph_output, graph_memory = graphed(*inputs)
+
+            assert graphed.graph is not None
+
+            assert torch.allclose(
+                eager_output.distributions.logits,
+                graph_output.distributions.logits,
+                atol=1e-5,
+            )
+            assert torch.allclose(eager_output.values, graph_output.values, atol=1e-5)
+            assert torch.allclose(
+                eager_memory.tensor("rnn"), graph_memory.tensor("rnn"), atol=1e-5
+            )
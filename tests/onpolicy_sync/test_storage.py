@@ -0,0 +1,138 @@
+from types import SimpleNamespace
+from typing import Dict, List
+
+import gym
+import torch
+
+from core.algorithms.onpolicy_sync.storage import RolloutStorage
+from core.base_abstractions.misc import Memory
+
+
+class TestRolloutStorage(object):
+    num_steps = 5
+    num_samplers = 7
+    hidden_size = 3
+
+    def make_rollouts(self) -> RolloutStorage:
+        actor_critic = SimpleNamespace(
+            recurrent_memory_specification={
+                "rnn": (
+                    (("layer", 2), ("sampler", None), ("hidden", self.hidden_size),),
+                    torch.float32,
+                )
+            },
+            action_space=gym.spaces.Discrete(4),
+        )
+        rollouts = RolloutStorage(
+            num_steps=self.num_steps,
+            num_samplers=self.num_samplers,
+            actor_critic=actor_critic,  # type:ignore
+        )
+
+        def observations() -> Dict:
+            return {
+                # Lets us recover which samplers are in each mini-batch
+                "sampler": torch.arange(self.num_samplers).float(),
+                "rgb": torch.rand(self.num_samplers, 4, 4, 3),
+                "goal": {"object": torch.randint(10, (self.num_samplers, 1))},
+            }
+
+        def memory() -> Memory:
+            return Memory(rnn=(torch.rand(2, self.num_samplers, self.hidden_size), 1))
+
+        rollouts.insert_observations(observations())
+        rollouts.insert_memory(memory(), time_step=0)
+        for _ in range(self.num_steps):
+            rollouts.insert(
+                observations=observations(),
+                memory=memory(),
+                actions=torch.randint(4, (1, self.num_samplers, 1, 1)),
+                action_log_probs=torch.rand(1, self.num_samplers, 1, 1),
+                value_preds=torch.rand(1, self.num_samplers, 1, 1),
+                rewards=torch.rand(1, self.num_samplers, 1, 1),
+                masks=torch.randint(2, (1, self.num_samplers, 1, 1)).float(),
+            )
+        rollouts.compute_returns(
+            next_value=torch.rand(self.num_samplers, 1, 1),
+            use_gae=True,
+            gamma=0.99,
+            tau=0.95,
+        )
+
+        return rollouts
+
+    @staticmethod
+    def gather_batch(
+        rollouts: RolloutStorage,
+        advantages: torch.Tensor,
+        normalized_advantages: torch.Tensor,
+        cur_samplers: List[int],
+    ) -> Dict:
+        # Mini-batch built by selecting samplers one by one, as
+        # `recurrent_generator` used to do
+        def stack(tensor: torch.Tensor) -> torch.Tensor:
+            return torch.stack([tensor[:, ind] for ind in cur_samplers], 1)
+
+        return {
+            "observations": rollouts.unflatten_observations(
+                rollouts.observations.slice(dim=0, stop=-1).sampler_select(cur_samplers)
+            ),
+            "memory": rollouts.memory.step_squeeze(0).sampler_select(cur_samplers),
+            "actions": stack(rollouts.actions),
+            "prev_actions": stack(rollouts.prev_actions[:-1]),
+            "values": stack(rollouts.value_preds[:-1]),
+            "returns": stack(rollouts.returns[:-1]),
+            "masks": stack(rollouts.masks[:-1]),
+            "old_action_log_probs": stack(rollouts.action_log_probs),
+            "adv_targ": stack(advantages),
+            "norm_adv_targ": stack(normalized_advantages),
+        }
+
+    def assert_equal(self, batch, expected):
+        if isinstance(expected, torch.Tensor):
+            assert isinstance(batch, torch.Tensor)
+            assert batch.shape == expected.shape
+            assert batch.dtype == expected.dtype
+            assert torch.equal(batch, expected)
+        elif isinstance(expected, Memory):
+            assert isinstance(batch, Memory)
+            assert set(batch.keys()) == set(expected.keys())
+            for key in expected:
+                assert batch.sampler_dim(key) == expected.sampler_dim(key)
+                self.assert_equal(batch.tensor(key), expected.tensor(key))
+        else:
+            assert isinstance(batch, dict)
+            assert set(batch.keys()) == set(expected.keys())
+            for key in expected:
+                self.assert_equal(batch[key], expected[key])
+
+    def test_recurrent_generator(self):
+        rollouts = self.make_rollouts()
+        advantages = rollouts.returns[:-1] - rollouts.value_preds[:-1]
+        normalized_advantages = (advantages - advantages.mean()) / (
+            advantages.std() + 1e-5
+        )
+
+        for num_mini_batch in range(1, self.num_samplers + 1):
+            covered: List[int] = []
+            for batch in rollouts.recurrent_generator(advantages, num_mini_batch):
+                sampler_obs = batch["observations"]["sampler"]
+                assert sampler_obs.shape[:1] == (self.num_steps,)
+                cur_samplers = sampler_obs[0].long().tolist()
+                assert (sampler_obs == sampler_obs[:1]).all()
+                assert len(cur_samplers) > 0
+                covered.extend(cur_samplers)
+
+                self.assert_equal(
+                    batch,
+                    self.gather_batch(
+                        rollouts, advantages, normalized_advantages, cur_samplers
+                    ),
+                )
+                # Mini-batches are passed to models using `view`
+                for key, val in batch.items():
+                    if isinstance(val, torch.Tensor):
+                        assert val.is_contiguous(), key
+
+            # Each sampler is in exactly one mini-batch
+            assert sorted(covered) == list(range(self.num_samplers))
@@ -301,6 +301,57 @@ class LinearDecay(object):
         return self.startp + (self.endp - self.startp) * (epoch / float(self.steps))
 
 
+class TableDecay(object):
+    """Linearly decay between two values over some number of steps using a
+    precomputed lookup table.
+
+    Behaves as `LinearDecay` up to the resolution of the table: the value for
+    the `i`th step is read from entry `i * (num_entries - 1) // steps` of
+    `num_entries` values linearly spaced between `startp` and `endp`.
+
+    # Parameters
+
+    steps : The number of steps over which to decay.
+    num_entries : The number of entries in the lookup table, e.g. the number of
+        updates taking place over `steps`. If `None`, one entry per step is used.
+    startp : The starting value.
+    endp : The ending value.
+    """
+
+    def __init__(
+        self,
+        steps: int,
+        num_entries: Optional[int] = None,
+        startp: float = 1.0,
+        endp: float = 0.0,
+    ) -> None:
+        """Initializer.
+
+        See class documentation for parameter definitions.
+        """
+        self.steps = steps
+        self.startp = startp
+        self.endp = endp
+
+        num_entries = steps + 1 if num_entries is None else num_entries
+        assert num_entries >= 2, "`num_entries` must be at least 2."
+        self._table = np.linspace(startp, endp, num_entries, dtype=np.float32)
+
+    def __call__(self, epoch: int) -> float:
+        """Get the decayed value for `epoch` number of steps.
+
+        # Parameters
+
+        epoch : The number of steps.
+
+        # Returns
+
+        Decayed value for `epoch` number of steps.
+        """
+        epoch = max(min(epoch, self.steps), 0)
+        return float(self._table[epoch * (len(self._table) - 1) // self.steps])
+
+
 # noinspection PyTypeHints,PyUnresolvedReferences
 def set_deterministic_cudnn() -> None:
     """Makes cudnn deterministic.
@@ -521,6 +572,20 @@ class TrainingPipeline(object):
         as to a tensorboard file.
     lr_scheduler_builder : Optional builder object to instantiate the learning rate scheduler used
         through the pipeline.
+    gradient_accumulation_steps : The number of consecutive mini-batches whose gradients are accumulated
+        before taking an optimizer step. Each optimizer step then corresponds to an effective batch of
+        `gradient_accumulation_steps` mini-batches while only a single mini-batch needs to fit in memory.
+    use_amp : Whether or not to use automatic mixed precision (with loss scaling when training in float16)
+        for the forward and backward passes of gradient updates. Only has an effect when training on a
+        CUDA device.
+    use_rollout_cuda_graph : Whether or not to capture the (gradient-free) forward pass used to collect
+        rollouts into a CUDA graph which is then replayed at every step, removing most of the kernel launch
+        overhead of small rollout batches. Only has an effect when training on a CUDA device with a torch
+        version providing `torch.cuda.CUDAGraph`.
+    rollout_quantization_interval : If not `None`, rollouts are collected with a dynamically quantized (INT8)
+        copy of the model's linear and recurrent layers, refreshed from the full precision weights every
+        `rollout_quantization_interval` rollouts. Gradient updates always use the full precision model.
+        Only has an effect when training on CPU (where quantized kernels are available).
     """
 
     # noinspection PyUnresolvedReferences
@@ -541,6 +606,10 @@ class TrainingPipeline(object):
         metric_accumulate_interval: int,
         should_log: bool = True,
         lr_scheduler_builder: Optional[Builder[optim.lr_scheduler._LRScheduler]] = None,  # type: ignore
+        gradient_accumulation_steps: int = 1,
+        use_amp: bool = False,
+        use_rollout_cuda_graph: bool = False,
+        rollout_quantization_interval: Optional[int] = None,
     ):
         """Initializer.
 
@@ -553,6 +622,18 @@ class TrainingPipeline(object):
         self.lr_scheduler_builder = lr_scheduler_builder
         self.num_mini_batch = num_mini_batch
 
+        assert (
+            gradient_accumulation_steps >= 1
+        ), "`gradient_accumulation_steps` must be a positive integer."
+        self.gradient_accumulation_steps = gradient_accumulation_steps
+        self.use_amp = use_amp
+        self.use_rollout_cuda_graph = use_rollout_cuda_graph
+
+        assert (
+            rollout_quantization_interval is None or rollout_quantization_interval >= 1
+        ), "`rollout_quantization_interval` must be either `None` or a positive integer."
+        self.rollout_quantization_interval = rollout_quantization_interval
+
         self.update_repeats = update_repeats
         self.max_grad_norm = max_grad_norm
         self.num_steps = num_steps
@@ -137,7 +137,8 @@ def batch_observations(
 
     observations :  List of dicts of observations.
     device : The torch.device to put the resulting tensors on.
-        Will not move the tensors if None.
+        Will not move the tensors if None. CPU tensors moved to a CUDA device
+        are batched in pinned memory and copied asynchronously.
 
     # Returns
 
@@ -166,14 +167,27 @@ def batch_observations(
             else:
                 input_batch[sensor].append(to_tensor(observation[sensor]))
 
+    use_pinned_memory = device is not None and torch.device(device).type == "cuda"
+
+    def stack_to_device(tensors: List[torch.Tensor]) -> torch.Tensor:
+        if not use_pinned_memory or tensors[0].device.type != "cpu":
+            return torch.stack(tensors, dim=0).to(device=device)
+
+        # Stacking into page-locked memory allows for an asynchronous host to device copy
+        batched = torch.empty(
+            (len(tensors),) + tuple(tensors[0].shape),
+            dtype=tensors[0].dtype,
+            pin_memory=True,
+        )
+        torch.stack(tensors, dim=0, out=batched)
+        return batched.to(device=device, non_blocking=True)
+
     def dict_to_batch(input_batch: Any) -> None:
         for sensor in input_batch:
             if isinstance(input_batch[sensor], Dict):
                 dict_to_batch(input_batch[sensor])
             else:
-                input_batch[sensor] = torch.stack(input_batch[sensor], dim=0).to(
-                    device=device
-                )
+                input_batch[sensor] = stack_to_device(input_batch[sensor])
 
     if len(observations) == 0:
         return cast(Dict[str, Union[Dict, torch.Tensor]], observations)